@@ -17,21 +17,528 @@ Features:
 """
 
 import os
+import re
 import json
+import time
+import random
 import base64
+import asyncio
 import configparser
 import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from functools import partial
+from dataclasses import dataclass
 from datetime import datetime
+import httplib2
 import pandas as pd
-from email import message_from_bytes
+from email import message_from_bytes, policy
+from email.utils import parsedate_to_datetime
 from bs4 import BeautifulSoup
 from google.auth.transport.requests import Request
+from google_auth_httplib2 import AuthorizedHttp
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+
+try:
+    import aiohttp
+except ImportError:  # only needed by fetch_and_store_emails_async
+    aiohttp = None
+
+try:
+    import pybase64
+except ImportError:  # optional SIMD-accelerated decoder
+    pybase64 = None
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as HTMLParser
+except ImportError:  # optional fast HTML parser; selectolax < 1.0 only ships the Modest backend
+    try:
+        from selectolax.parser import HTMLParser
+    except ImportError:
+        HTMLParser = None
+
+try:
+    import hyperscan
+except ImportError:  # optional DFA matcher for [FILTERS] tags
+    hyperscan = None
+
+try:
+    import lxml  # noqa: F401
+    BS4_PARSER = 'lxml'
+except ImportError:
+    BS4_PARSER = 'html.parser'
+
+GMAIL_API_URL = 'https://gmail.googleapis.com/gmail/v1/users/me'
+# Gmail accepts up to 100 sub-requests per batch but advises 50 to avoid per-user concurrency 429s
+BATCH_SIZE = 50
+# Times a rate-limited batch sub-request is retried, with exponential backoff
+MAX_BATCH_RETRIES = 5
+# Upper bound on raw message bytes (Gmail sizeEstimate) fetched, parsed and written per step;
+# raw messages carry their attachments inline, so this bounds peak memory. Sizes come from the
+# header pass, which fetch_body = true skips unless [EMAIL] raw_batch_bytes is set (that costs a
+# second messages.get per message, doubling the quota units of a run)
+RAW_BATCH_BYTES = 16 << 20
+# Append-only job statistics log, one JSON object per run
+JOB_STATS_PATH = 'data/job_stats.jsonl'
+# Smallest batch worth the start-up cost of a process pool for parsing
+PARALLEL_PARSE_MIN = 50
+# Headers requested by the header-only (format=metadata) pass
+METADATA_HEADERS = ['Subject', 'From', 'Date', 'Content-Type']
+
+
+def _urlsafe_b64decode(data):
+    """
+    Decodes Gmail's URL-safe base64 payloads, using pybase64 when it is installed.
+
+    Args:
+        data (str): URL-safe base64 encoded string
+
+    Returns:
+        bytes-like: Decoded payload (bytearray under pybase64, bytes otherwise)
+    """
+    if pybase64 is not None:
+        return pybase64.b64decode_as_bytearray(data, altchars=b'-_', validate=False)
+    return base64.urlsafe_b64decode(data)
+
+
+def _decode_text(data, charset=None):
+    """
+    Decodes a MIME part payload using its declared charset, falling back to UTF-8.
+
+    Args:
+        data (bytes): Transfer-decoded part payload
+        charset (str): Charset from the part's Content-Type, if any
+
+    Returns:
+        str: Decoded text
+    """
+    try:
+        return data.decode(charset or 'utf-8', errors='replace')
+    except LookupError:  # unknown charset name
+        return data.decode('utf-8', errors='replace')
+
+
+def _is_rate_limited(exception):
+    """
+    Tells whether a failed Gmail request was throttled and is worth retrying.
+
+    Args:
+        exception (Exception): Error reported for a request or batch sub-request
+
+    Returns:
+        bool: True for HTTP 429 or a 403 rateLimitExceeded/userRateLimitExceeded error
+    """
+    if not isinstance(exception, HttpError):
+        return False
+    return _is_rate_limited_response(exception.resp.status, exception.content)
+
+
+def _is_rate_limited_response(status, content):
+    """
+    Tells whether a Gmail HTTP response is a throttling error.
+
+    Args:
+        status (int): HTTP status code
+        content (bytes): Response body
+
+    Returns:
+        bool: True for HTTP 429 or a 403 rateLimitExceeded/userRateLimitExceeded error
+    """
+    if status == 429:
+        return True
+    reasons = (b'rateLimitExceeded', b'userRateLimitExceeded')
+    return status == 403 and any(reason in content for reason in reasons)
+
+
+def _html_to_text(html, charset=None):
+    """
+    Extracts visible text from HTML with the fastest parser available: selectolax, lxml, then html.parser.
+
+    Args:
+        html (bytes): HTML document or fragment, still encoded
+        charset (str): Charset from the part's Content-Type, if any
+
+    Returns:
+        str: Extracted text
+    """
+    # Decode a declared charset once, with replacement; only undeclared bytes are left to the parser to sniff
+    if charset:
+        html = _decode_text(html, charset)
+    if HTMLParser is not None:
+        # Match BeautifulSoup's get_text, which leaves out <head> and script/style contents
+        tree = HTMLParser(html)
+        tree.strip_tags(['script', 'style'])
+        return tree.body.text(separator=' ', strip=True) if tree.body is not None else ''
+    return BeautifulSoup(html, BS4_PARSER).get_text(separator=' ', strip=True)
+
+
+def _parse_message_datetime(date_str):
+    """
+    Parses an RFC 2822 Date header.
+
+    Args:
+        date_str (str): Raw Date header value
+
+    Returns:
+        datetime: Message timestamp, or None if the header is missing or malformed
+    """
+    try:
+        return parsedate_to_datetime(date_str)
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_message_date(date_str):
+    """
+    Parses an RFC 2822 Date header into the calendar date it names.
+
+    Args:
+        date_str (str): Raw Date header value
+
+    Returns:
+        date: Message date, or None if the header is missing or malformed
+    """
+    msg_datetime = _parse_message_datetime(date_str)
+    return msg_datetime.date() if msg_datetime else None
+
+
+def _parse_raw(message):
+    """
+    Parses a format=raw Gmail message into a stdlib EmailMessage.
+
+    Args:
+        message (dict): Gmail message detail JSON fetched with format='raw'
+
+    Returns:
+        email.message.EmailMessage: Parsed MIME message with decoded headers
+    """
+    return message_from_bytes(_urlsafe_b64decode(message['raw']), policy=policy.default)
+
+
+def _get_email_body(mime):
+    """
+    Extracts plain text from email body, preferring text/plain parts over text/html.
+
+    Args:
+        mime (email.message.EmailMessage): Parsed MIME message
+
+    Returns:
+        str: Extracted message body as plain text
+    """
+    plain, html = [], []
+    for part in mime.walk():
+        if part.is_multipart() or part.get_filename():
+            continue
+        if part.get_content_type() == 'text/plain':
+            plain.append(part)
+        elif part.get_content_type() == 'text/html':
+            html.append(part)
+
+    # Payloads stay bytes until their single decode, with the part's own charset.
+    # text/html is usually an alternative rendering of the same content; parse it only as a fallback
+    if plain:
+        return ''.join(_decode_text(part.get_payload(decode=True), part.get_content_charset()) for part in plain)
+    return ''.join(_html_to_text(part.get_payload(decode=True), part.get_content_charset()) for part in html)
+
+
+def _get_attachments(mime):
+    """
+    Collects the attachments of a parsed MIME message.
+
+    Args:
+        mime (email.message.EmailMessage): Parsed MIME message
+
+    Returns:
+        list: (filename, decoded payload bytes) pairs
+    """
+    return [
+        (part.get_filename(), part.get_payload(decode=True))
+        for part in mime.walk()
+        if not part.is_multipart() and part.get_filename()
+    ]
+
+
+class TagMatcher:
+    """
+    Assigns category tags to text in a single pass, from a spec such as
+    ``shopping:amazon|flipkart; banking:hdfc|icici``.
+
+    All categories are compiled into one matcher: a hyperscan database when
+    hyperscan is installed, otherwise one ``re`` pattern with an optional
+    lookahead per tag, so overlapping tags are all reported as hyperscan does.
+    Only the spec is pickled, so matchers can be sent to worker processes.
+    """
+
+    def __init__(self, tags):
+        """
+        Compiles the matcher for the given tags.
+
+        Args:
+            tags (dict): Tag name -> regex alternation
+        """
+        self.tags = tags
+        self._compile()
+
+    @classmethod
+    def from_config(cls, spec):
+        """
+        Parses a [FILTERS] tags spec into a matcher.
+
+        Args:
+            spec (str): Value of [FILTERS] tags
+
+        Returns:
+            TagMatcher: Compiled matcher, or None if the spec is empty
+        """
+        tags = {}
+        for entry in filter(None, (e.strip() for e in spec.split(';'))):
+            name, _, alternation = entry.partition(':')
+            name = name.strip()
+            if not name.isidentifier() or not alternation.strip():
+                raise ValueError(f"Invalid [FILTERS] tags entry: {entry!r}")
+            tags[name] = alternation.strip()
+        return cls(tags) if tags else None
+
+    def _compile(self):
+        self._names = list(self.tags)
+        if hyperscan is not None:
+            self._db = hyperscan.Database()
+            self._db.compile(
+                expressions=[alternation.encode() for alternation in self.tags.values()],
+                ids=list(range(len(self._names))),
+                elements=len(self._names),
+                flags=[hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_SINGLEMATCH] * len(self._names),
+            )
+            self._pattern = None
+        else:
+            self._db = None
+            # The leading lookahead only lets the scan stop where some tag starts; the optional
+            # per-tag lookaheads then record every tag matching there, not just the leftmost one
+            any_tag = '|'.join(f'(?:{alternation})' for alternation in self.tags.values())
+            self._pattern = re.compile(
+                f'(?=(?:{any_tag}))' + ''.join(f'(?=(?P<{name}>{alternation}))?' for name, alternation in self.tags.items()),
+                re.IGNORECASE,
+            )
+
+    def __getstate__(self):
+        return self.tags
+
+    def __setstate__(self, tags):
+        self.tags = tags
+        self._compile()
+
+    def match(self, text):
+        """
+        Scans text once and reports which tags occur in it.
+
+        Args:
+            text (str): Text to scan
+
+        Returns:
+            list: Names of the tags found, in spec order
+
+        Example:
+            >>> TagMatcher.from_config('a:foo; b:foobar').match('FooBar')
+            ['a', 'b']
+        """
+        found = set()
+        if self._db is not None:
+            def on_match(tag_id, start, end, flags, context):
+                found.add(self._names[tag_id])
+            self._db.scan(text.encode('utf-8', errors='replace'), match_event_handler=on_match)
+        else:
+            for m in self._pattern.finditer(text):
+                found.update(name for name, value in m.groupdict().items() if value is not None)
+                if len(found) == len(self._names):
+                    break
+        return [name for name in self._names if name in found]
+
+
+def extract_metadata_static(message, body_chars=None, tag_matcher=None):
+    """
+    Extracts sender, subject, date, body and attachment payloads from a message
+    without touching the network or disk.
+
+    Kept at module level so it can be pickled into a ProcessPoolExecutor. Attachments
+    are returned as (filename, payload) pairs for the caller to write out.
+
+    Args:
+        message (dict): Gmail message detail, format='raw' or header-only format='metadata'
+        body_chars (int): Truncate the body to this many characters; None keeps it whole
+        tag_matcher (TagMatcher): When given, the full body is scanned and matched tags stored under 'Tags'
+
+    Returns:
+        dict: Parsed metadata and body content
+    """
+    if 'raw' not in message:
+        headers = message.get('payload', {}).get('headers', [])
+        hdrs = {h['name'].lower(): h['value'] for h in headers if h.get('name', '').lower() in ('subject', 'from', 'date')}
+        data = {
+            'Id': message.get('id', ''),
+            'Subject': hdrs.get('subject', ''),
+            'From': hdrs.get('from', ''),
+            'Date': hdrs.get('date', ''),
+            'Body': '',
+            'Attachments': [],
+        }
+        if tag_matcher is not None:
+            data['Tags'] = []
+        return data
+
+    mime = _parse_raw(message)
+    body = _get_email_body(mime)
+    data = {
+        'Id': message.get('id', ''),
+        'Subject': str(mime.get('Subject', '')),
+        'From': str(mime.get('From', '')),
+        'Date': str(mime.get('Date', '')),
+        'Body': body[:body_chars],
+        'Attachments': _get_attachments(mime),
+    }
+    if tag_matcher is not None:
+        data['Tags'] = tag_matcher.match(body)
+    return data
+
+
+def parse_messages(details, pool=None, body_chars=None, tag_matcher=None):
+    """
+    Runs extract_metadata_static over many messages, in a process pool when one is given.
+
+    Args:
+        details (list): Gmail message detail JSON
+        pool (ProcessPoolExecutor): Worker pool; None parses inline
+        body_chars (int): Body truncation passed to extract_metadata_static
+        tag_matcher (TagMatcher): Tag matcher passed to extract_metadata_static
+
+    Returns:
+        list: Parsed metadata dictionaries, in input order
+    """
+    extract = partial(extract_metadata_static, body_chars=body_chars, tag_matcher=tag_matcher)
+    if pool is None:
+        return [extract(detail) for detail in details]
+    return list(pool.map(extract, details, chunksize=8))
+
+
+def _size_groups(messages, max_bytes=RAW_BATCH_BYTES, max_count=BATCH_SIZE):
+    """
+    Splits messages into consecutive groups whose summed sizeEstimate stays within max_bytes.
+
+    A message larger than max_bytes forms a group of its own.
+
+    Args:
+        messages (list): Header-only Gmail message detail JSON, carrying sizeEstimate
+        max_bytes (int): Size budget per group
+        max_count (int): Maximum messages per group
+
+    Returns:
+        list: Lists of messages
+    """
+    groups, group, group_bytes = [], [], 0
+    for message in messages:
+        size = message.get('sizeEstimate', 0)
+        if group and (len(group) == max_count or group_bytes + size > max_bytes):
+            groups.append(group)
+            group, group_bytes = [], 0
+        group.append(message)
+        group_bytes += size
+    if group:
+        groups.append(group)
+    return groups
+
+
+@dataclass(frozen=True, slots=True)
+class EmailCfg:
+    """
+    Immutable snapshot of the [EMAIL] config section, read once at start-up.
+    """
+    from_email: str
+    has_attachment: bool
+    keyword: str
+    after_date: str
+    before_date: str
+    max_results: int
+    fetch_body: bool
+    parse_workers: int | None
+    body_snippet_chars: int
+    keep_full_body: bool
+    raw_batch_bytes: int | None
+
+    @classmethod
+    def from_section(cls, cfg):
+        """
+        Reads every [EMAIL] setting, applying the defaults used across the tool.
+
+        Args:
+            cfg (configparser.SectionProxy): The [EMAIL] section
+
+        Returns:
+            EmailCfg: Parsed settings
+        """
+        return cls(
+            from_email=cfg.get('from_email', ''),
+            has_attachment=cfg.getboolean('has_attachment', fallback=False),
+            keyword=cfg.get('keyword', ''),
+            after_date=cfg.get('after_date', ''),
+            before_date=cfg.get('before_date', ''),
+            max_results=cfg.getint('max_results'),
+            fetch_body=cfg.getboolean('fetch_body', fallback=True),
+            parse_workers=cfg.getint('parse_workers', fallback=None),
+            body_snippet_chars=cfg.getint('body_snippet_chars', fallback=2000),
+            keep_full_body=cfg.getboolean('keep_full_body', fallback=False),
+            raw_batch_bytes=cfg.getint('raw_batch_bytes', fallback=None),
+        )
+
+    @property
+    def body_chars(self):
+        """
+        Body length limit passed to the parser.
+
+        Returns:
+            int: Number of body characters to store, or None to keep the full body
+        """
+        return None if self.keep_full_body else self.body_snippet_chars
+
+    def query_filters(self):
+        """
+        Builds the sender, attachment and keyword filters of the Gmail query.
+
+        Returns:
+            tuple: Query parts that never depend on dates
+        """
+        q_parts = []
+        if self.from_email:
+            q_parts.append(f"from:{self.from_email}")
+        if self.has_attachment:
+            q_parts.append("has:attachment")
+        if self.keyword:
+            q_parts.append(self.keyword)
+        return tuple(q_parts)
+
+    def query_dates(self):
+        """
+        Builds the configured date bounds of the Gmail query.
+
+        Returns:
+            tuple: after:/before: parts for the dates set in config
+        """
+        q_parts = []
+        if self.after_date:
+            q_parts.append(f"after:{self.after_date}")
+        if self.before_date:
+            q_parts.append(f"before:{self.before_date}")
+        return tuple(q_parts)
 
 
 class GmailUtility:
+    # (creds, service) per token file, kept per thread because httplib2.Http is not thread-safe
+    _thread_local = threading.local()
+    # Serializes authentication, which may rewrite the shared token file
+    _auth_lock = threading.Lock()
+
     def __init__(self, config_path='config.ini'):
         """
         Initializes the GmailUtility class using the provided config file.
@@ -48,15 +555,20 @@ class GmailUtility:
         self.attachment_dir = self.config.get('PATHS', 'attachment_dir')
         self.output_csv = self.config.get('PATHS', 'output_csv')
         self.tracker_path = self.config.get('PATHS', 'last_run_tracker')
+        self.seen_ids_path = os.path.splitext(self.output_csv)[0] + '.ids'
+        self._email = EmailCfg.from_section(self.config['EMAIL'])
+        self._query_filters = self._email.query_filters()
+        self._query_dates = self._email.query_dates()
+        self.tag_matcher = TagMatcher.from_config(self.config.get('FILTERS', 'tags', fallback=''))
 
         os.makedirs(self.attachment_dir, exist_ok=True)
         os.makedirs(os.path.dirname(self.output_csv), exist_ok=True)
 
-        self.creds = self.authenticate()
-        self.service = build('gmail', 'v1', credentials=self.creds)
+        self.creds, self.service = self._get_service()
 
         self.processed_count = 0
         self.error_count = 0
+        self.history_id = None
 
         logging.info("Initialized GmailUtility with config at %s", config_path)
 
@@ -89,6 +601,50 @@ class GmailUtility:
 
         return creds
 
+    def _get_service(self):
+        """
+        Returns this thread's cached credentials and Gmail service for the token file,
+        building them on first use.
+
+        Every thread gets its own service and HTTP connection, as google-api-python-client
+        requires, so instances created in different API server threads never share one.
+
+        Returns:
+            tuple: (Credentials, Gmail API service resource)
+        """
+        token_file = self.config.get('AUTH', 'token_file')
+        cache = getattr(GmailUtility._thread_local, 'services', None)
+        if cache is None:
+            cache = GmailUtility._thread_local.services = {}
+
+        cached = cache.get(token_file)
+        # AuthorizedHttp refreshes expired tokens itself, so only a dead token forces a rebuild
+        if cached and (cached[0].valid or cached[0].refresh_token):
+            return cached
+
+        with GmailUtility._auth_lock:
+            creds = self.authenticate()
+        service = self._build_service(creds)
+        cache[token_file] = (creds, service)
+        return creds, service
+
+    def _build_service(self, creds):
+        """
+        Builds the Gmail service on a persistent, caching HTTP connection.
+
+        build() reads the discovery document bundled with google-api-python-client,
+        so no discovery request goes over the network.
+
+        Args:
+            creds (Credentials): Authorized Gmail credentials
+
+        Returns:
+            Gmail API service resource
+        """
+        http_cache = self.config.get('PATHS', 'http_cache', fallback='.http_cache')
+        http = AuthorizedHttp(creds, http=httplib2.Http(cache=http_cache, timeout=30))
+        return build('gmail', 'v1', http=http, static_discovery=True)
+
     def build_query(self, use_incremental=True):
         """
         Constructs Gmail search query based on config file.
@@ -99,19 +655,7 @@ class GmailUtility:
         Returns:
             str: Gmail search query string
         """
-        q_parts = []
-        cfg = self.config['EMAIL']
-        if cfg.get('from_email'):
-            q_parts.append(f"from:{cfg.get('from_email')}")
-        if cfg.getboolean('has_attachment', fallback=False):
-            q_parts.append("has:attachment")
-        if cfg.get('keyword'):
-            q_parts.append(cfg.get('keyword'))
-        if cfg.get('after_date'):
-            q_parts.append(f"after:{cfg.get('after_date')}")
-        if cfg.get('before_date'):
-            q_parts.append(f"before:{cfg.get('before_date')}")
-
+        q_parts = [*self._query_filters, *self._query_dates]
         if use_incremental:
             last_ts = self._load_last_timestamp()
             if last_ts:
@@ -129,7 +673,7 @@ class GmailUtility:
         Returns:
             list: List of message metadata dictionaries
         """
-        max_results = max_results or int(self.config.get('EMAIL', 'max_results'))
+        max_results = max_results or self._email.max_results
         try:
             result = self.service.users().messages().list(userId='me', q=query, maxResults=max_results).execute()
             return result.get('messages', [])
@@ -138,146 +682,527 @@ class GmailUtility:
             self.error_count += 1
             return []
 
-    def get_message_detail(self, msg_id):
+    def _message_request(self, msg_id, fetch_level='raw'):
         """
-        Retrieves full email message using message ID.
+        Builds (without executing) a messages().get request at the given fetch level.
 
         Args:
             msg_id (str): Gmail message ID
+            fetch_level (str): 'raw' for the whole RFC 822 message, 'metadata' for METADATA_HEADERS only
 
         Returns:
-            dict: Full message detail JSON
+            HttpRequest: Unexecuted Gmail API request
+        """
+        messages = self.service.users().messages()
+        if fetch_level == 'metadata':
+            return messages.get(userId='me', id=msg_id, format='metadata', metadataHeaders=METADATA_HEADERS)
+        return messages.get(userId='me', id=msg_id, format=fetch_level)
+
+    def get_message_detail(self, msg_id, fetch_level='raw'):
+        """
+        Retrieves email message using message ID.
+
+        Args:
+            msg_id (str): Gmail message ID
+            fetch_level (str): 'raw' for the whole message, 'metadata' for headers only
+
+        Returns:
+            dict: Message detail JSON
         """
         try:
-            return self.service.users().messages().get(userId='me', id=msg_id, format='full').execute()
+            return self._message_request(msg_id, fetch_level).execute()
         except Exception as e:
             logging.error("Error fetching message ID %s: %s", msg_id, str(e))
             self.error_count += 1
             return {}
 
+    def _execute_batched(self, request_ids, make_request, callback):
+        """
+        Executes one request per ID in Gmail batches, retrying throttled sub-requests with backoff.
+
+        Args:
+            request_ids (list): IDs, used as batch request_ids
+            make_request (callable): Builds a fresh unexecuted request for an ID
+            callback (callable): Called as callback(request_id, response, exception) once per ID
+        """
+        for start in range(0, len(request_ids), BATCH_SIZE):
+            pending = request_ids[start:start + BATCH_SIZE]
+            for attempt in range(MAX_BATCH_RETRIES + 1):
+                throttled = []
+
+                def on_response(request_id, response, exception, attempt=attempt):
+                    if exception is not None and attempt < MAX_BATCH_RETRIES and _is_rate_limited(exception):
+                        throttled.append(request_id)
+                        return
+                    callback(request_id, response, exception)
+
+                batch = self.service.new_batch_http_request(callback=on_response)
+                for request_id in pending:
+                    batch.add(make_request(request_id), request_id=request_id)
+                batch.execute()
+
+                if not throttled:
+                    break
+                logging.info("Retrying %d rate-limited requests (attempt %d).", len(throttled), attempt + 1)
+                time.sleep(2 ** attempt + random.random())
+                pending = throttled
+
+    def get_message_details(self, msg_ids, fetch_level='raw'):
+        """
+        Retrieves email messages for many IDs using Gmail batch requests.
+
+        Args:
+            msg_ids (list): Gmail message IDs
+            fetch_level (str): 'raw' for the whole message, 'metadata' for headers only
+
+        Returns:
+            list: Message detail JSON for every ID fetched successfully, in input order
+        """
+        details = {}
+
+        def on_message(request_id, response, exception):
+            if exception is not None:
+                logging.error("Error fetching message ID %s: %s", request_id, str(exception))
+                self.error_count += 1
+                return
+            details[request_id] = response
+
+        self._execute_batched(msg_ids, lambda msg_id: self._message_request(msg_id, fetch_level), on_message)
+
+        return [details[msg_id] for msg_id in msg_ids if msg_id in details]
+
+    def _needs_full_fetch(self, message):
+        """
+        Decides from a header-only message whether its full raw content has to be fetched.
+
+        Only plain text/* messages and multipart/alternative bodies are known to carry
+        no attachment; anything else (multipart/mixed, multipart/related, a top-level
+        application/pdf, ...) is fetched. A missing Content-Type means text/plain.
+
+        Args:
+            message (dict): Gmail message detail fetched with fetch_level='metadata'
+
+        Returns:
+            bool: True if the body is wanted or the message may carry attachments
+        """
+        if self._email.fetch_body:
+            return True
+        content_type = 'text/plain'
+        for h in message.get('payload', {}).get('headers', []):
+            if h.get('name', '').lower() == 'content-type':
+                content_type = h['value'].split(';', 1)[0].strip().lower()
+        return not (content_type.startswith('text/') or content_type == 'multipart/alternative')
+
+    def _uses_header_pass(self):
+        """
+        Tells whether messages get a header-only pass before their raw fetch.
+
+        With fetch_body every message is fetched raw anyway, so the pass only runs
+        when [EMAIL] raw_batch_bytes asks for byte-bounded batches, at the cost of a
+        second messages.get (and its quota units) per message.
+
+        Returns:
+            bool: True if headers are fetched first
+        """
+        return not self._email.fetch_body or self._email.raw_batch_bytes is not None
+
+    def _split_headers(self, headers):
+        """
+        Splits header-only messages into those complete as they are and groups of IDs to fetch raw.
+
+        Args:
+            headers (list): Gmail message detail JSON fetched with fetch_level='metadata'
+
+        Returns:
+            tuple: (header-only messages to keep, lists of message IDs to fetch raw)
+        """
+        header_only = [d for d in headers if not self._needs_full_fetch(d)]
+        need_full = [d for d in headers if self._needs_full_fetch(d)]
+        max_bytes = self._email.raw_batch_bytes or RAW_BATCH_BYTES
+        return header_only, [[d['id'] for d in group] for group in _size_groups(need_full, max_bytes)]
+
+    def iter_message_batches(self, msg_ids):
+        """
+        Fetches messages in bounded batches, raw where needed and header-only otherwise.
+
+        Raw messages carry their attachments inline, so after a header pass raw fetches
+        are grouped by sizeEstimate. Callers parse and write each batch before asking
+        for the next, which keeps peak memory near RAW_BATCH_BYTES however large the
+        mailbox is. When the header pass is skipped (see _uses_header_pass), batches
+        are BATCH_SIZE messages each. Messages whose raw fetch fails are left out, so
+        the next run retries them.
+
+        Args:
+            msg_ids (list): Gmail message IDs
+
+        Yields:
+            list: Message detail JSON, raw where required and header-only otherwise
+        """
+        if not self._uses_header_pass():
+            for start in range(0, len(msg_ids), BATCH_SIZE):
+                yield self.get_message_details(msg_ids[start:start + BATCH_SIZE])
+            return
+        header_only, groups = self._split_headers(self.get_message_details(msg_ids, fetch_level='metadata'))
+        if header_only:
+            yield header_only
+        for group in groups:
+            yield self.get_message_details(group)
+
+    def _parse_pool(self, n_messages):
+        """
+        Returns a process pool for parsing when the run is large enough to pay for one.
+
+        Args:
+            n_messages (int): Number of messages in the run
+
+        Returns:
+            Context manager yielding a ProcessPoolExecutor, or None for inline parsing
+        """
+        if n_messages < PARALLEL_PARSE_MIN or self._email.parse_workers == 1:
+            return nullcontext()
+        return ProcessPoolExecutor(max_workers=self._email.parse_workers)
+
+    def _parse_and_save(self, details, pool=None):
+        """
+        Parses a batch of messages and writes their attachments.
+
+        Args:
+            details (list): Gmail message detail JSON
+            pool (ProcessPoolExecutor): Worker pool for parsing; None parses inline
+
+        Returns:
+            list: Metadata dictionaries with saved attachment paths
+        """
+        records = []
+        # CPU-bound parsing may fan out to worker processes; attachment IO stays here
+        for meta in parse_messages(details, pool, self._email.body_chars, self.tag_matcher):
+            meta['Attachments'] = self._save_attachments(meta['Attachments'])
+            records.append(meta)
+            self.processed_count += 1
+        return records
+
     def get_email_body(self, message):
         """
-        Extracts plain text from email body (text/plain or text/html).
+        Extracts plain text from email body, preferring text/plain parts over text/html.
 
         Args:
-            message (dict): Gmail message detail JSON
+            message (dict): Gmail message detail JSON fetched with format='raw'
 
         Returns:
             str: Extracted message body as plain text
         """
-        payload = message.get('payload', {})
-        parts = payload.get('parts', [])
-        body = ''
-        if 'data' in payload.get('body', {}):
-            body += base64.urlsafe_b64decode(payload['body']['data']).decode('utf-8', errors='ignore')
-        for part in parts:
-            if 'data' in part.get('body', {}):
-                decoded = base64.urlsafe_b64decode(part['body']['data']).decode('utf-8', errors='ignore')
-                if part.get('mimeType') == 'text/plain':
-                    body += decoded
-                elif part.get('mimeType') == 'text/html':
-                    body += BeautifulSoup(decoded, 'html.parser').get_text()
-        return body
+        return _get_email_body(_parse_raw(message))
+
+    def _save_attachments(self, attachments):
+        """
+        Writes attachment payloads into the attachment directory.
+
+        Args:
+            attachments (list): (filename, payload bytes) pairs
+
+        Returns:
+            list: List of saved attachment file paths
+        """
+        paths = []
+        for filename, payload in attachments:
+            filepath = os.path.join(self.attachment_dir, filename)
+            with open(filepath, 'wb') as f:
+                f.write(payload)
+            paths.append(filepath)
+        return paths
 
     def download_attachments(self, message):
         """
-        Downloads attachments from a Gmail message.
+        Saves the attachments carried inside a raw Gmail message.
 
         Args:
-            message (dict): Gmail message detail JSON
+            message (dict): Gmail message detail JSON fetched with format='raw'
 
         Returns:
             list: List of saved attachment file paths
         """
-        attachments = []
-        parts = message.get('payload', {}).get('parts', [])
-        for part in parts:
-            filename = part.get('filename')
-            body = part.get('body', {})
-            if filename and 'attachmentId' in body:
-                att_id = body['attachmentId']
-                attachment = self.service.users().messages().attachments().get(
-                    userId='me', messageId=message['id'], id=att_id
-                ).execute()
-                data = base64.urlsafe_b64decode(attachment['data'])
-                filepath = os.path.join(self.attachment_dir, filename)
-                with open(filepath, 'wb') as f:
-                    f.write(data)
-                attachments.append(filepath)
-        return attachments
-
-    def extract_metadata(self, message):
+        if 'raw' not in message:
+            return []
+        return self._save_attachments(_get_attachments(_parse_raw(message)))
+
+    def extract_metadata(self, message, download_attachments=True):
         """
         Extracts sender, subject, date, body, and attachments from message.
 
         Args:
             message (dict): Gmail message detail
+            download_attachments (bool): Whether to save attachments as part of extraction
 
         Returns:
             dict: Parsed metadata and body content
         """
-        headers = message.get('payload', {}).get('headers', [])
-        data = {'Subject': '', 'From': '', 'Date': '', 'Body': '', 'Attachments': []}
-        for h in headers:
-            name = h.get('name', '').lower()
-            if name == 'subject':
-                data['Subject'] = h['value']
-            elif name == 'from':
-                data['From'] = h['value']
-            elif name == 'date':
-                data['Date'] = h['value']
-        data['Body'] = self.get_email_body(message)
-        data['Attachments'] = self.download_attachments(message)
+        data = extract_metadata_static(message, self._email.body_chars, self.tag_matcher)
+        data['Attachments'] = self._save_attachments(data['Attachments']) if download_attachments else []
         return data
 
-    def _load_last_timestamp(self):
+    def _load_seen_ids(self):
+        if os.path.exists(self.seen_ids_path):
+            with open(self.seen_ids_path) as f:
+                return {line.strip() for line in f if line.strip()}
+        return self._seed_seen_ids()
+
+    def _seed_seen_ids(self):
+        """
+        Builds the .ids sidecar from the Id column of an output CSV that predates it.
+
+        Returns:
+            set: Message IDs already stored, empty if the CSV is missing or has no Id column
+        """
+        if not os.path.exists(self.output_csv) or 'Id' not in pd.read_csv(self.output_csv, nrows=0).columns:
+            return set()
+        seen = set(pd.read_csv(self.output_csv, usecols=['Id'], dtype=str)['Id'].dropna())
+        with open(self.seen_ids_path, 'w') as f:
+            f.writelines(f"{msg_id}\n" for msg_id in seen)
+        logging.info("Seeded %s with %d stored message IDs.", self.seen_ids_path, len(seen))
+        return seen
+
+    def _drop_legacy_duplicates(self, records):
+        """
+        Drops records already present in an output CSV written before message IDs were stored.
+
+        Such a CSV has no Id column to dedup on, so rows are matched by their Date
+        header timestamp instead. This runs once, until the .ids sidecar exists.
+
+        Args:
+            records (list): Metadata dictionaries about to be stored
+
+        Returns:
+            list: Records not yet present in the CSV
+        """
+        if 'Date' not in pd.read_csv(self.output_csv, nrows=0).columns:
+            return records
+        stored = pd.read_csv(self.output_csv, usecols=['Date'], dtype=str)['Date'].dropna()
+        stored_dates = set(filter(None, map(_parse_message_datetime, stored)))
+        fresh = [meta for meta in records if _parse_message_datetime(meta['Date']) not in stored_dates]
+        if len(fresh) < len(records):
+            logging.info("Skipping %d emails already in %s.", len(records) - len(fresh), self.output_csv)
+        return fresh
+
+    def _filter_unseen(self, messages):
+        """
+        Drops messages whose IDs are already stored in the output CSV.
+
+        Args:
+            messages (list): Message metadata dictionaries from list_messages
+
+        Returns:
+            list: Messages not yet ingested
+        """
+        seen = self._load_seen_ids()
+        unseen = [msg for msg in messages if msg['id'] not in seen]
+        if len(unseen) < len(messages):
+            logging.info("Skipping %d already ingested emails.", len(messages) - len(unseen))
+        return unseen
+
+    def _load_tracker(self):
         if os.path.exists(self.tracker_path):
             with open(self.tracker_path) as f:
-                return json.load(f).get('last_timestamp')
-        return None
+                return json.load(f)
+        return {}
 
-    def _save_last_timestamp(self, date_str):
+    def _update_tracker(self, **fields):
+        tracker = self._load_tracker()
+        tracker.update(fields)
         with open(self.tracker_path, 'w') as f:
-            json.dump({'last_timestamp': date_str}, f)
+            json.dump(tracker, f)
+
+    def _load_last_timestamp(self):
+        return self._load_tracker().get('last_timestamp')
+
+    def _save_last_timestamp(self, date_str):
+        self._update_tracker(last_timestamp=date_str)
+
+    def _has_added_messages(self, start_history_id):
+        """
+        Checks whether any message was added to the mailbox since a Gmail history ID.
+
+        Only the first matching history record is requested. The response also
+        carries the mailbox's current historyId, which becomes the next cursor.
+
+        Args:
+            start_history_id (str): historyId saved by a previous run
+
+        Returns:
+            bool: Whether messages were added, or None if the history ID has expired
+        """
+        request = self.service.users().history().list(
+            userId='me', startHistoryId=start_history_id, historyTypes=['messageAdded'], maxResults=1
+        )
+        try:
+            while request is not None:
+                response = request.execute()
+                self.history_id = response.get('historyId', self.history_id)
+                if response.get('history'):
+                    return True
+                request = self.service.users().history().list_next(request, response)
+        except HttpError as e:
+            if e.resp.status == 404:
+                logging.info("History ID %s has expired; falling back to date query.", start_history_id)
+                return None
+            raise
+        return False
+
+    def list_new_messages(self):
+        """
+        Lists messages that still need ingesting.
+
+        If a previous run stored a Gmail historyId and nothing has been added to
+        the mailbox since, no search is issued at all. Otherwise the configured
+        query is listed and already ingested IDs are dropped.
+
+        Returns:
+            list: Message metadata dictionaries to fetch
+        """
+        last_history_id = self._load_tracker().get('history_id')
+        added = self._has_added_messages(last_history_id) if last_history_id else None
+        if added is None:
+            # No usable cursor: read the current one before listing so mail arriving mid-run is seen next time
+            self.history_id = self.service.users().getProfile(userId='me').execute()['historyId']
+        elif not added:
+            logging.info("No messages added since history ID %s.", last_history_id)
+            return []
+        return self._filter_unseen(self.list_messages(self.build_query()))
+
+    def _save_history_id(self):
+        # Keep the old cursor after failures so the next run retries the same window
+        if self.history_id and self.error_count == 0:
+            self._update_tracker(history_id=self.history_id)
 
     def fetch_and_store_emails(self):
         """
         Master function to extract emails, parse metadata, and save to CSV.
-        Logs performance metrics and stores job stats to Excel for monitoring.
+        Logs performance metrics and appends job stats to a JSONL file for monitoring.
         """
         try:
-            query = self.build_query()
-            messages = self.list_messages(query)
+            messages = self.list_new_messages()
             records = []
-            latest_date = None
-
-            for msg in messages:
-                detail = self.get_message_detail(msg['id'])
-                meta = self.extract_metadata(detail)
-                records.append(meta)
-                self.processed_count += 1
-
-                try:
-                    msg_date = datetime.strptime(meta['Date'][:16], '%a, %d %b %Y')
-                    if not latest_date or msg_date > latest_date:
-                        latest_date = msg_date
-                except Exception:
-                    continue
-
-            if not records:
-                logging.info("No new emails found.")
-                return
 
-            df = pd.DataFrame(records)
-            if os.path.exists(self.output_csv):
-                df_existing = pd.read_csv(self.output_csv)
-                df = pd.concat([df_existing, df]).drop_duplicates()
+            with self._parse_pool(len(messages)) as pool:
+                for details in self.iter_message_batches([msg['id'] for msg in messages]):
+                    records.extend(self._parse_and_save(details, pool))
 
-            df.to_csv(self.output_csv, index=False)
-            logging.info("Saved %d emails to %s", len(records), self.output_csv)
+            self._store_records(records)
+            self._save_history_id()
+
+        except Exception as e:
+            logging.exception("Job failed due to error: %s", str(e))
+
+        finally:
+            self._log_job_stats()
+
+    async def _refresh_token_async(self, token_lock, stale_token):
+        """
+        Refreshes the OAuth token off the event loop, once for all requests that saw it go stale.
+
+        Args:
+            token_lock (asyncio.Lock): Serializes refreshes across concurrent requests
+            stale_token (str): Token the caller found expired or rejected
+        """
+        async with token_lock:
+            if self.creds.token == stale_token:
+                await asyncio.to_thread(self.creds.refresh, Request())
+
+    async def _fetch_details_async(self, session, semaphore, token_lock, msg_ids, fetch_level='raw'):
+        """
+        Retrieves email messages for many IDs concurrently over aiohttp.
 
-            if latest_date:
-                self._save_last_timestamp(latest_date.strftime('%Y/%m/%d'))
+        Each request carries the current bearer token; an expired or rejected (401)
+        token is refreshed and the request retried. Throttled requests are retried
+        with the same backoff as the batch path.
+
+        Args:
+            session (aiohttp.ClientSession): HTTP session
+            semaphore (asyncio.Semaphore): Bounds the number of in-flight requests
+            token_lock (asyncio.Lock): Serializes token refreshes
+            msg_ids (list): Gmail message IDs
+            fetch_level (str): 'raw' for the whole message, 'metadata' for headers only
+
+        Returns:
+            list: Message detail JSON for every ID fetched successfully, in input order
+        """
+        params = [('format', fetch_level)]
+        if fetch_level == 'metadata':
+            params += [('metadataHeaders', h) for h in METADATA_HEADERS]
+        details = {}
+
+        async def fetch(msg_id):
+            try:
+                for attempt in range(MAX_BATCH_RETRIES + 1):
+                    token = self.creds.token
+                    if not self.creds.valid:
+                        await self._refresh_token_async(token_lock, token)
+                        token = self.creds.token
+                    headers = {'Authorization': f'Bearer {token}'}
+                    async with semaphore:
+                        async with session.get(f"{GMAIL_API_URL}/messages/{msg_id}", params=params, headers=headers) as resp:
+                            if resp.status < 400:
+                                details[msg_id] = await resp.json()
+                                return
+                            retry = attempt < MAX_BATCH_RETRIES and (
+                                resp.status == 401 or _is_rate_limited_response(resp.status, await resp.read())
+                            )
+                            if not retry:
+                                resp.raise_for_status()
+                    if resp.status == 401:
+                        await self._refresh_token_async(token_lock, token)
+                    else:
+                        await asyncio.sleep(2 ** attempt + random.random())
+            except Exception as e:
+                logging.error("Error fetching message ID %s: %s", msg_id, str(e))
+                self.error_count += 1
+
+        async with asyncio.TaskGroup() as tg:
+            for msg_id in msg_ids:
+                tg.create_task(fetch(msg_id))
+
+        return [details[msg_id] for msg_id in msg_ids if msg_id in details]
+
+    async def fetch_and_store_emails_async(self, max_concurrency=20):
+        """
+        Async variant of fetch_and_store_emails that downloads messages concurrently.
+
+        Messages are split into the same bounded batches as the sync path; each batch
+        is parsed off the event loop before the next is fetched.
+
+        Args:
+            max_concurrency (int): Maximum number of in-flight message requests
+
+        Example:
+            >>> asyncio.run(gmail.fetch_and_store_emails_async())
+        """
+        if aiohttp is None:
+            raise ImportError("aiohttp is required for fetch_and_store_emails_async")
+
+        try:
+            messages = self.list_new_messages()
+            records = []
+
+            semaphore = asyncio.Semaphore(max_concurrency)
+            token_lock = asyncio.Lock()
+
+            async with aiohttp.ClientSession() as session:
+                msg_ids = [msg['id'] for msg in messages]
+                if self._uses_header_pass():
+                    details = await self._fetch_details_async(session, semaphore, token_lock, msg_ids, fetch_level='metadata')
+                    header_only, groups = self._split_headers(details)
+                else:
+                    header_only = []
+                    groups = [msg_ids[start:start + BATCH_SIZE] for start in range(0, len(msg_ids), BATCH_SIZE)]
+
+                with self._parse_pool(len(messages)) as pool:
+                    if header_only:
+                        records.extend(await asyncio.to_thread(self._parse_and_save, header_only, pool))
+                    for group in groups:
+                        batch = await self._fetch_details_async(session, semaphore, token_lock, group)
+                        records.extend(await asyncio.to_thread(self._parse_and_save, batch, pool))
+
+            self._store_records(records)
+            self._save_history_id()
 
         except Exception as e:
             logging.exception("Job failed due to error: %s", str(e))
@@ -285,9 +1210,49 @@ class GmailUtility:
         finally:
             self._log_job_stats()
 
+    def _store_records(self, records):
+        """
+        Saves extracted records to the output CSV and advances the last-run timestamp.
+
+        Args:
+            records (list): Metadata dictionaries returned by extract_metadata
+        """
+        if not records:
+            logging.info("No new emails found.")
+            return
+
+        msg_dates = (_parse_message_date(meta['Date']) for meta in records)
+        latest_date = max(filter(None, msg_dates), default=None)
+
+        file_exists = os.path.exists(self.output_csv)
+        new_records = records
+        if file_exists and not os.path.exists(self.seen_ids_path):
+            new_records = self._drop_legacy_duplicates(records)
+
+        df = pd.DataFrame(new_records, columns=list(records[0]))
+        if not file_exists:
+            df.to_csv(self.output_csv, index=False)
+        else:
+            columns = list(pd.read_csv(self.output_csv, nrows=0).columns)
+            added = [col for col in df.columns if col not in columns]
+            if added:
+                # New columns (e.g. Id, Tags) need a new header: rewrite the file once
+                logging.warning("Adding columns %s to %s; rewriting it once.", added, self.output_csv)
+                df_existing = pd.read_csv(self.output_csv, dtype=str)
+                pd.concat([df_existing, df])[columns + added].to_csv(self.output_csv, index=False)
+            else:
+                # Append in the existing column order; only the header row is read
+                df.reindex(columns=columns).to_csv(self.output_csv, mode='a', header=False, index=False)
+        with open(self.seen_ids_path, 'a') as f:
+            f.writelines(f"{meta['Id']}\n" for meta in records)
+        logging.info("Saved %d emails to %s", len(new_records), self.output_csv)
+
+        if latest_date:
+            self._save_last_timestamp(latest_date.strftime('%Y/%m/%d'))
+
     def _log_job_stats(self):
         """
-        Append job statistics to an Excel file for performance monitoring.
+        Append job statistics as one JSON line for performance monitoring.
         """
         end_time = datetime.now()
         duration = (end_time - self.job_start_time).total_seconds()
@@ -303,13 +1268,22 @@ class GmailUtility:
             "Status": "Completed" if self.error_count == 0 else "Completed with errors"
         }
 
-        stats_path = "data/job_stats.xlsx"
-        if os.path.exists(stats_path):
-            df_stats = pd.read_excel(stats_path)
-        else:
-            df_stats = pd.DataFrame(columns=row.keys())
+        with open(JOB_STATS_PATH, 'a') as f:
+            f.write(json.dumps(row) + '\n')
+        logging.info("Job stats logged to %s", JOB_STATS_PATH)
+
+    @staticmethod
+    def export_job_stats(xlsx_path='data/job_stats.xlsx'):
+        """
+        Writes the accumulated job statistics to an Excel file for human review.
+
+        Args:
+            xlsx_path (str): Destination .xlsx path
 
-        df_stats = pd.concat([df_stats, pd.DataFrame([row])])
-        df_stats.to_excel(stats_path, index=False)
-        logging.info("Job stats logged to %s", stats_path)
+        Example:
+            >>> GmailUtility.export_job_stats()
+        """
+        df_stats = pd.read_json(JOB_STATS_PATH, lines=True)
+        df_stats.to_excel(xlsx_path, index=False)
+        logging.info("Job stats exported to %s", xlsx_path)
 
@@ -1,5 +1,19 @@
 from datetime import datetime, timedelta
+from functools import lru_cache
 import calendar
+import logging
+
+
+@lru_cache(maxsize=2)
+def _month_bounds(year, month):
+    """
+    Returns the first and last day of a month as Gmail query dates.
+
+    Cached per (year, month), so a month rollover naturally yields new bounds.
+    """
+    last_day = calendar.monthrange(year, month)[1]
+    return f"{year:04d}/{month:02d}/01", f"{year:04d}/{month:02d}/{last_day:02d}"
+
 
 def build_query(self, use_incremental=True):
     """
@@ -10,37 +24,22 @@ def build_query(self, use_incremental=True):
     - Else, default to current month start-end
     - If use_incremental = True, and last_run_timestamp exists → override with that
 
+    The filter parts are built once at start-up (GmailUtility._query_filters)
+    and the month defaults once per month, so per-request work is limited to
+    the date suffixes.
+
     Returns:
         str: Gmail-compatible query string
     """
 
-    q_parts = []
-    cfg = self.config['EMAIL']
-
-    # Add sender filter
-    if cfg.get('from_email'):
-        q_parts.append(f"from:{cfg.get('from_email')}")
-
-    # Add attachment filter
-    if cfg.getboolean('has_attachment', fallback=False):
-        q_parts.append("has:attachment")
-
-    # Add keyword
-    if cfg.get('keyword'):
-        q_parts.append(cfg.get('keyword'))
+    after_date = self._email.after_date.strip()
+    before_date = self._email.before_date.strip()
 
     # --- Date logic begins ---
-    after_date = cfg.get('after_date', '').strip()
-    before_date = cfg.get('before_date', '').strip()
-
     if not after_date or not before_date:
         # Default to current month
         today = datetime.today()
-        first_day = today.replace(day=1)
-        last_day = today.replace(day=calendar.monthrange(today.year, today.month)[1])
-
-        after_date = first_day.strftime("%Y/%m/%d")
-        before_date = last_day.strftime("%Y/%m/%d")
+        after_date, before_date = _month_bounds(today.year, today.month)
 
         logging.info(f"No dates in config. Defaulting to current month: {after_date} to {before_date}")
 
@@ -50,9 +49,6 @@ def build_query(self, use_incremental=True):
         if last_ts:
             logging.info(f"Using incremental load. Overriding after_date to last_run: {last_ts}")
             after_date = last_ts
-
-    q_parts.append(f"after:{after_date}")
-    q_parts.append(f"before:{before_date}")
     # --- Date logic ends ---
 
-    return " ".join(q_parts)
+    return " ".join((*self._query_filters, f"after:{after_date}", f"before:{before_date}"))
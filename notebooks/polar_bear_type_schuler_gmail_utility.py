@@ -1,12 +1,13 @@
 import os
 import time
-import socket
+import asyncio
 import psutil
 import logging
 import configparser
-import subprocess
 from datetime import datetime
-from apscheduler.schedulers.background import BackgroundScheduler
+from functools import lru_cache
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.interval import IntervalTrigger
 
 # ------------------ Load Config ------------------
 config = configparser.ConfigParser()
@@ -39,63 +40,104 @@ os.makedirs(os.path.dirname(log_file), exist_ok=True)
 logging.basicConfig(filename=log_file, level=logging.INFO)
 
 # ------------------ Utility Functions ------------------
-def is_internet_connected():
-    try:
-        socket.create_connection(("8.8.8.8", 53), timeout=3)
+INTERNET_CHECK_TTL = 60  # seconds a successful connectivity probe is trusted
+_last_connected_at = 0.0
+
+async def is_internet_connected():
+    global _last_connected_at
+    if time.monotonic() - _last_connected_at < INTERNET_CHECK_TTL:
         return True
-    except OSError:
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection("8.8.8.8", 53), timeout=3)
+    except (OSError, asyncio.TimeoutError):
         return False
+    writer.close()
+    await writer.wait_closed()
+    _last_connected_at = time.monotonic()
+    return True
 
-def is_ram_free(threshold):
+RAM_CHECK_TTL = 5  # seconds a memory reading is reused
+
+@lru_cache(maxsize=1)
+def _ram_percent_free(time_bucket):
     mem = psutil.virtual_memory()
-    return mem.available * 100 / mem.total > threshold
+    return mem.available * 100 / mem.total
+
+def is_ram_free(threshold):
+    return _ram_percent_free(int(time.time() // RAM_CHECK_TTL)) > threshold
 
-def is_laptop_active():
+async def is_laptop_active():
     try:
         if os.name == 'nt':
             from ctypes import windll
             return windll.user32.GetForegroundWindow() != 0
         else:
-            idle_time = int(os.popen("xprintidle").read()) // 1000  # seconds
+            proc = await asyncio.create_subprocess_exec("xprintidle", stdout=asyncio.subprocess.PIPE)
+            stdout, _ = await proc.communicate()
+            idle_time = int(stdout) // 1000  # seconds
             return idle_time < (max_idle_minutes * 60)
-    except:
+    except Exception:  # not CancelledError, so shutdown is not mistaken for activity
         return True  # Assume active
 
 # ------------------ Ingestion Job ------------------
-def run_job():
+# Set by the daily cron trigger and cleared once the job actually runs, so a run
+# skipped for unmet conditions is retried on every condition check until it goes through.
+job_due = False
+
+async def mark_job_due():
+    global job_due
+    job_due = True
+    await run_job()
+
+async def run_job():
+    global job_due
+    if not job_due:
+        return
+    # Claim the run before the first await so an overlapping trigger cannot start a second one
+    job_due = False
+
     now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     logging.info(f"[{now}] Checking job conditions...")
 
-    if not is_internet_connected():
+    if not await is_internet_connected():
         logging.info("🛑 Skipped: No internet connection.")
+        job_due = True
         return
     if not is_ram_free(min_ram_free):
         logging.info(f"🛑 Skipped: Less than {min_ram_free}% free RAM.")
+        job_due = True
         return
-    if not is_laptop_active():
+    if not await is_laptop_active():
         logging.info(f"🛑 Skipped: Laptop is idle > {max_idle_minutes} min or locked.")
+        job_due = True
         return
 
     logging.info("✅ All conditions met. Running ingestion job...")
 
     try:
         cmd = f"source {venv_activate} && cd {project_dir} && python {script_name}"
-        subprocess.call(["/bin/bash", "-c", cmd])
+        proc = await asyncio.create_subprocess_exec("/bin/bash", "-c", cmd)
+        await proc.wait()
         logging.info("✅ Job executed successfully.")
     except Exception as e:
         logging.error(f"❌ Job failed: {str(e)}")
 
 # ------------------ Scheduler Setup ------------------
-scheduler = BackgroundScheduler()
-scheduler.add_job(run_job, 'cron', hour=hour, minute=minute)
-scheduler.start()
+async def main():
+    scheduler = AsyncIOScheduler()
+    scheduler.add_job(mark_job_due, 'cron', hour=hour, minute=minute)
+    scheduler.add_job(run_job, IntervalTrigger(seconds=loop_interval))
+    scheduler.start()
 
-print("Smart scheduler started in background...")
+    print("Smart scheduler started in background...")
+
+    try:
+        await asyncio.Event().wait()
+    finally:
+        scheduler.shutdown()
+        print("Smart scheduler stopped.")
 
 try:
-    while True:
-        time.sleep(loop_interval)
+    asyncio.run(main())
 except (KeyboardInterrupt, SystemExit):
-    scheduler.shutdown()
-    print("Smart scheduler stopped.")
-
+    pass